@@ -0,0 +1,19 @@
+# Gunicorn settings, picked up automatically by `gunicorn server:app`
+import os
+
+# Threaded workers: a slow /api/chat call to Gemini ties up one thread rather
+# than the whole worker, so storage and auth requests keep being served.
+# (gevent would need psycopg2 and the gRPC-based Gemini client patched to
+# cooperate; threads overlap their blocking I/O as they are.)
+worker_class = 'gthread'
+# server.py reads GUNICORN_THREADS too, to keep its KDF cap below this.
+threads = max(int(os.getenv('GUNICORN_THREADS', 8)), 1)
+
+# Worker count comes from WEB_CONCURRENCY (gunicorn's default, 1). The session
+# and storage caches in server.py are per-process: with more workers, a write
+# handled by one worker can leave another serving the old value until its
+# cache entry expires (60s), so prefer scaling with threads.
+
+# Import the app once in the master: init_db() runs a single time and the
+# loaded modules are shared copy-on-write with the workers.
+preload_app = True
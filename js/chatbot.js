@@ -180,8 +180,41 @@ Try asking me things like:
         this.renderTypingIndicator();
 
         try {
-            // Get AI response
-            const response = await this.getAIResponse(message);
+            // Show the reply as it streams in; the message is created on the first chunk
+            let streamedMsg = null;
+            let streamedElement = null;
+            const response = await this.getAIResponse(message, (text) => {
+                if (!streamedMsg) {
+                    this.removeTypingIndicator();
+                    streamedMsg = {
+                        role: 'assistant',
+                        content: '',
+                        timestamp: Date.now()
+                    };
+                    this.messages.push(streamedMsg);
+                    this.renderMessages();
+
+                    const messageElements = document.querySelectorAll('.chat-message.assistant .message-content');
+                    streamedElement = messageElements[messageElements.length - 1];
+                }
+                streamedMsg.content = text;
+                if (streamedElement) {
+                    streamedElement.innerHTML = this.formatMessageContent(text);
+                }
+                this.scrollToBottom();
+            });
+
+            if (streamedMsg) {
+                // The final text may differ if the stream failed part way and fell back
+                if (streamedMsg.content !== response) {
+                    streamedMsg.content = response;
+                    this.renderMessages();
+                }
+                this.saveHistory();
+                this.isTyping = false;
+                this.scrollToBottom();
+                return;
+            }
 
             // Remove typing indicator before starting the type effect
             this.removeTypingIndicator();
@@ -253,8 +286,9 @@ Try asking me things like:
 
     /**
      * Get AI response using backend API
+     * onChunk is called with the text received so far while the reply streams
      */
-    async getAIResponse(userMessage) {
+    async getAIResponse(userMessage, onChunk = () => {}) {
         // Get financial context
         const financialSummary = await Entries.getFinancialSummary();
 
@@ -285,8 +319,7 @@ User's Savings Goal:
             .map(m => `${m.role === 'user' ? 'User' : 'Assistant'}: ${m.content}`)
             .join('\n');
 
-        // Build context for AI
-        // Build context for AI
+        // Static instructions; the server reuses its model for an unchanged system prompt
         const systemContext = `You are WealthFlow AI, a helpful personal financial advisor assistant. You have access to the user's financial data and should provide personalized, realistic advice.
 
 === IMPORTANT RESTRICTIONS ===
@@ -294,9 +327,25 @@ User's Savings Goal:
 2. OFF-TOPIC: If the user asks about anything unrelated to finance (e.g., general knowledge, coding, entertainment, news, etc.), politely decline and remind them you're a financial advisor.
 3. NO IMAGE ANALYSIS: If asked to read, analyze, or describe images, politely explain you cannot process images and can only assist with financial questions.
 4. PROFESSIONALISM: Decline any requests containing profanity, inappropriate content, or offensive language. Respond politely but firmly.
-5. CONVERSATION MEMORY: You have access to recent conversation history below. Use it to provide contextual and personalized responses.
+5. CONVERSATION MEMORY: Each message comes with the user's profile, financial data and recent conversation history. Use it to provide contextual and personalized responses.
+
+=== RESPONSE GUIDELINES ===
+- **BE HUMAN AND CONVERSATIONAL**: Respond like a friendly financial advisor, not a robot
+- **MATCH RESPONSE LENGTH TO QUESTION**: 
+  * Simple greetings ("hi", "hello") → Brief, warm greeting (1-2 sentences max)
+  * Quick questions → Short, direct answers
+  * Complex financial questions → More detailed but still focused responses
+- **AVOID ESSAYS**: Never dump all financial data unprompted. Only share relevant info when asked
+- Be concise and friendly, address the user by name if available
+- Use Indian Rupee (₹) for amounts
+- Only provide detailed analysis when specifically asked
+- When discussing savings goals, be REALISTIC and HONEST
+- Don't sugarcoat - if finances need work, say so kindly but clearly
+- Remember details from the conversation history to provide continuity
+- Use casual, friendly language - not formal or robotic`;
 
-=== USER PROFILE ===
+        // Per-user data and history, sent alongside the message
+        const userContext = `=== USER PROFILE ===
 - Name: ${profile.name || 'Not set'}
 - Age: ${profile.age || 'Not set'}
 ${goalContext}
@@ -324,22 +373,7 @@ Recent Transactions:
 ${financialSummary.allCurrentEntries.slice(-5).map(e => `- ${e.date}: ${e.costHead} - ${e.type === 'income' ? '+' : '-'}₹${(e.amountINR || e.amount).toLocaleString('en-IN')}`).join('\n')}
 
 === RECENT CONVERSATION HISTORY ===
-${conversationHistory || 'No previous messages.'}
-
-=== RESPONSE GUIDELINES ===
-- **BE HUMAN AND CONVERSATIONAL**: Respond like a friendly financial advisor, not a robot
-- **MATCH RESPONSE LENGTH TO QUESTION**: 
-  * Simple greetings ("hi", "hello") → Brief, warm greeting (1-2 sentences max)
-  * Quick questions → Short, direct answers
-  * Complex financial questions → More detailed but still focused responses
-- **AVOID ESSAYS**: Never dump all financial data unprompted. Only share relevant info when asked
-- Be concise and friendly, address the user by name if available
-- Use Indian Rupee (₹) for amounts
-- Only provide detailed analysis when specifically asked
-- When discussing savings goals, be REALISTIC and HONEST
-- Don't sugarcoat - if finances need work, say so kindly but clearly
-- Remember details from the conversation history to provide continuity
-- Use casual, friendly language - not formal or robotic`;
+${conversationHistory || 'No previous messages.'}`;
 
 
         try {
@@ -351,6 +385,7 @@ ${conversationHistory || 'No previous messages.'}
                 credentials: 'include',
                 body: JSON.stringify({
                     system_context: systemContext,
+                    context: userContext,
                     message: userMessage
                 })
             });
@@ -360,8 +395,8 @@ ${conversationHistory || 'No previous messages.'}
                 throw new Error(errData.error || `API error: ${response.status}`);
             }
 
-            const data = await response.json();
-            return data.response || 'I apologize, I could not generate a response. Please try again.';
+            const text = await this.readEventStream(response, onChunk);
+            return text || 'I apologize, I could not generate a response. Please try again.';
 
         } catch (error) {
             console.error('AI API error:', error);
@@ -369,6 +404,45 @@ ${conversationHistory || 'No previous messages.'}
         }
     },
 
+    /**
+     * Read a text/event-stream reply from /api/chat, returning the full text
+     */
+    async readEventStream(response, onChunk) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line; keep any partial one for the next read
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const event of events) {
+                const lines = event.split('\n');
+                const type = lines.find(line => line.startsWith('event: '))?.slice(7) || 'message';
+                const data = lines
+                    .filter(line => line.startsWith('data: '))
+                    .map(line => line.slice(6))
+                    .join('\n');
+                if (!data) continue;
+
+                const payload = JSON.parse(data);
+                if (type === 'error') {
+                    throw new Error(payload.error);
+                }
+                text += payload.t;
+                onChunk(text);
+            }
+        }
+
+        return text;
+    },
+
     /**
      * Provide offline responses when API is not available
      */
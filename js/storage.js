@@ -56,6 +56,29 @@ const Storage = {
         }
     },
 
+    /**
+     * Save several keys in one request, e.g. { [KEYS.ENTRIES]: [] }
+     */
+    async setMany(values) {
+        try {
+            if (!Auth.isAuthenticated()) return false;
+
+            const items = Object.entries(values).map(([key, value]) => ({ key, value }));
+            if (items.length === 0) return true;
+
+            const response = await fetch('/api/storage/bulk', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                credentials: 'include',
+                body: JSON.stringify({ items })
+            });
+            return response.ok;
+        } catch (e) {
+            console.error('Storage setMany error:', e);
+            return false;
+        }
+    },
+
     /**
      * Remove data from SQLite via Backend (session-based auth)
      */
@@ -80,39 +103,44 @@ const Storage = {
     async init() {
         if (!Auth.isAuthenticated()) return;
 
+        // Collect missing defaults and save them in a single request
+        const defaults = {};
+
         // Initialize entries array if not exists
         if (!(await this.get(this.KEYS.ENTRIES))) {
-            await this.set(this.KEYS.ENTRIES, []);
+            defaults[this.KEYS.ENTRIES] = [];
         }
 
         // Initialize fixed templates if not exists
         if (!(await this.get(this.KEYS.FIXED_TEMPLATES))) {
-            await this.set(this.KEYS.FIXED_TEMPLATES, []);
+            defaults[this.KEYS.FIXED_TEMPLATES] = [];
         }
 
         // Initialize default categories
         let currentCategories = await this.get(this.KEYS.CATEGORIES);
         if (!currentCategories || Object.keys(currentCategories).length === 0 || !currentCategories.expense) {
-            await this.set(this.KEYS.CATEGORIES, DEFAULT_CATEGORIES);
+            defaults[this.KEYS.CATEGORIES] = DEFAULT_CATEGORIES;
         } else if (!currentCategories.investment) {
             // Migration: add investment categories if missing
             currentCategories.investment = DEFAULT_CATEGORIES.investment;
-            await this.set(this.KEYS.CATEGORIES, currentCategories);
+            defaults[this.KEYS.CATEGORIES] = currentCategories;
         }
 
         // Initialize settings
         if (!(await this.get(this.KEYS.SETTINGS))) {
-            await this.set(this.KEYS.SETTINGS, {
+            defaults[this.KEYS.SETTINGS] = {
                 baseCurrency: 'INR',
                 theme: 'dark'
-            });
+            };
         }
 
         // Initialize chat history
         if (!(await this.get(this.KEYS.CHAT_HISTORY))) {
-            await this.set(this.KEYS.CHAT_HISTORY, []);
+            defaults[this.KEYS.CHAT_HISTORY] = [];
         }
 
+        await this.setMany(defaults);
+
         // Check and populate fixed entries for current month
         await this.populateFixedEntriesForMonth();
     },
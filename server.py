@@ -1,68 +1,199 @@
+import hashlib
+import hmac
+import itertools
 import os
+import queue
 import sqlite3
-import json
-import google.generativeai as genai
-from functools import wraps
-from flask import Flask, request, jsonify, send_from_directory, session
+import threading
+import orjson
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from cachetools import LRUCache, TTLCache
+from flask import Flask, Response, request, jsonify, send_from_directory, session, g
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
-from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
-import urllib.parse
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from a local .env; deploys set them directly
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+if os.path.exists(ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
 
-# Configure Gemini
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 60))
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson; used by jsonify and request.json"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__, static_folder='.')
+app.json = OrjsonProvider(app)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-change-in-production')
 CORS(app, supports_credentials=True)
 
+# Compress text responses (zstd/br/gzip as negotiated). Flask-Compress suffixes
+# ETags with the encoding; it re-evaluates conditional requests for the static
+# routes so they keep answering 304s.
+app.config['COMPRESS_STREAMING_ENDPOINT_CONDITIONAL'] = ['serve_index', 'serve_static']
+Compress(app)
+
 DB_PATH = os.getenv('DATABASE_PATH', 'expenses.db')
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+if DATABASE_URL:
+    from psycopg2.extensions import cursor as TupleCursor
+    from psycopg2.extras import RealDictCursor, execute_values
+    from psycopg2.pool import ThreadedConnectionPool
+
 # --- Database Abstraction ---
 
+SQLITE_PRAGMAS = '''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA cache_size=-64000;
+    PRAGMA temp_store=MEMORY;
+'''
+
+class SQLitePool:
+    """Keeps idle SQLite connections around so their page cache survives between requests.
+
+    Mirrors the getconn/putconn interface of psycopg2's pools.
+    """
+
+    def __init__(self, path, maxconn=20):
+        self.path = path
+        self._idle = queue.LifoQueue(maxconn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SQLITE_PRAGMAS)
+        return conn
+
+    def getconn(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def putconn(self, conn, close=False):
+        if not close:
+            try:
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        conn.close()
+
+    def closeall(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if DATABASE_URL:
+                    _pool = ThreadedConnectionPool(
+                        minconn=2, maxconn=20, dsn=DATABASE_URL, cursor_factory=RealDictCursor
+                    )
+                else:
+                    _pool = SQLitePool(DB_PATH)
+    return _pool
+
+def close_pool():
+    """Close pooled connections; the next get_db() opens a fresh pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+# Queries are written with SQLite ? placeholders; the Postgres variants are
+# derived once here rather than rewritten on every execute()
+SQLITE_SQL = {
+    'get_storage': 'SELECT value FROM storage_new WHERE user_id = ? AND key = ?',
+    'set_storage': '''
+        INSERT INTO storage_new (user_id, key, value) 
+        VALUES (?, ?, ?) 
+        ON CONFLICT(user_id, key) DO UPDATE SET value = excluded.value
+    ''',
+    'del_storage': 'DELETE FROM storage_new WHERE user_id = ? AND key = ?',
+    # Prefer the exact-case row if older accounts differ only by case
+    'get_user': 'SELECT * FROM users WHERE lower(username) = lower(?) ORDER BY username = ? DESC LIMIT 1',
+    'username_case_duplicates': 'SELECT lower(username) FROM users GROUP BY lower(username) HAVING COUNT(*) > 1',
+    'get_user_by_id': 'SELECT id, username, role FROM users WHERE id = ?',
+    'insert_user': 'INSERT INTO users (username, password_hash) VALUES (?, ?)',
+    'record_migration': 'INSERT INTO schema_migrations (version) VALUES (?) ON CONFLICT DO NOTHING',
+}
+# executemany runs the single-row upsert per row
+SQLITE_SQL['set_storage_many'] = SQLITE_SQL['set_storage']
+POSTGRES_SQL = {name: sql.replace('?', '%s') for name, sql in SQLITE_SQL.items()}
+POSTGRES_SQL['insert_user'] += ' RETURNING id, username, role'
+# execute_values expands a single VALUES %s into all rows
+POSTGRES_SQL['set_storage_many'] = '''
+    INSERT INTO storage_new (user_id, key, value) 
+    VALUES %s 
+    ON CONFLICT(user_id, key) DO UPDATE SET value = excluded.value
+'''
+
+# The dialect is fixed for the life of the process, so pick its queries once
+SQL = POSTGRES_SQL if DATABASE_URL else SQLITE_SQL
+
 class DBConnection:
-    def __init__(self, db_url=None):
-        self.db_url = db_url
+    def __init__(self):
         self.conn = None
-        self.is_postgres = bool(db_url)
+        self.is_postgres = bool(DATABASE_URL)
+        self.sql = SQL
 
     def __enter__(self):
-        if self.is_postgres:
-            import psycopg2
-            from psycopg2.extras import RealDictCursor
-            try:
-                self.conn = psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
-            except Exception as e:
-                print(f"Error connecting to Postgres: {e}")
-                raise
-        else:
-            self.conn = sqlite3.connect(DB_PATH)
-            self.conn.row_factory = sqlite3.Row
+        try:
+            self.pool = get_pool()
+            self.conn = self.pool.getconn()
+        except Exception as e:
+            print(f"Error connecting to database: {e}")
+            raise
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.conn:
-            if exc_type:
-                self.conn.rollback()
-            else:
-                self.conn.commit()
-            self.conn.close()
+            try:
+                if exc_type:
+                    self.conn.rollback()
+                else:
+                    self.conn.commit()
+            finally:
+                # Return to the pool; psycopg2 marks broken connections as closed
+                self.pool.putconn(self.conn, close=bool(getattr(self.conn, 'closed', False)))
+                self.conn = None
 
-    def execute(self, sql, params=None):
+    def execute(self, sql, params=None, as_tuple=False):
+        """Run a query; as_tuple returns plain tuple rows instead of dict-like ones"""
         if params is None:
             params = ()
         
-        # Convert SQLite ? placeholders to Postgres %s if needed
-        if self.is_postgres:
-            sql = sql.replace('?', '%s')
-        
-        cursor = self.conn.cursor()
+        # sqlite3 keeps a per-connection cache of compiled statements, which
+        # the pool keeps warm across requests
+        if as_tuple and self.is_postgres:
+            cursor = self.conn.cursor(cursor_factory=TupleCursor)
+        else:
+            cursor = self.conn.cursor()
+            if as_tuple:
+                cursor.row_factory = None
         try:
             cursor.execute(sql, params)
             return cursor
@@ -70,52 +201,251 @@ class DBConnection:
             print(f"Query Error: {e} | SQL: {sql}")
             raise
 
+    def execute_many(self, sql, rows):
+        """Run sql for every row of params in one round-trip and transaction"""
+        cursor = self.conn.cursor()
+        try:
+            if self.is_postgres:
+                # page_size defaults to 100 rows per statement
+                execute_values(cursor, sql, rows, page_size=max(len(rows), 1))
+            else:
+                # Pooled SQLite connections autocommit, so group the rows explicitly
+                if not self.conn.in_transaction:
+                    cursor.execute('BEGIN')
+                cursor.executemany(sql, rows)
+            return cursor
+        except Exception as e:
+            print(f"Query Error: {e} | SQL: {sql}")
+            raise
+
 def get_db():
-    return DBConnection(DATABASE_URL)
+    return DBConnection()
+
+# --- Schema ---
+
+class SchemaError(Exception):
+    """A migration can't be applied without manual intervention"""
+
+def check_username_case_duplicates(db):
+    # The old case-sensitive UNIQUE allowed e.g. Bob and bob side by side
+    rows = db.execute(db.sql['username_case_duplicates'], as_tuple=True).fetchall()
+    if rows:
+        names = ', '.join(row[0] for row in rows)
+        raise SchemaError(
+            f"Rename users whose names differ only by case before the "
+            f"case-insensitive username index can be created: {names}"
+        )
+
+# Ordered migrations, each applied once and recorded in schema_migrations.
+# Steps are SQL, with {id_col} filled in with the dialect's auto-increment
+# primary key, or callables taking the connection.
+MIGRATIONS = [
+    (
+        '''
+            CREATE TABLE IF NOT EXISTS users (
+                id {id_col},
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                role TEXT DEFAULT 'user',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''',
+        '''
+            CREATE TABLE IF NOT EXISTS storage_new (
+                user_id INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (user_id, key),
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''',
+    ),
+    (
+        check_username_case_duplicates,
+        'CREATE UNIQUE INDEX IF NOT EXISTS users_username_lower ON users (lower(username))',
+    ),
+]
 
 def init_db():
+    """Apply any pending schema migrations"""
     # Use the context manager to ensure commit/close
     with get_db() as db:
+        id_col = 'SERIAL PRIMARY KEY' if db.is_postgres else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+        db.execute('CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY)')
+        current = db.execute('SELECT MAX(version) FROM schema_migrations', as_tuple=True).fetchone()[0] or 0
+        for version, statements in enumerate(MIGRATIONS, start=1):
+            if version <= current:
+                continue
+            # Apply each version atomically; pooled SQLite connections autocommit
+            if not db.is_postgres:
+                db.execute('BEGIN')
+            for step in statements:
+                if callable(step):
+                    step(db)
+                else:
+                    db.execute(step.format(id_col=id_col))
+            db.execute(db.sql['record_migration'], (version,))
+            db.conn.commit()
+        # Refresh planner statistics on every start
         if db.is_postgres:
-            # PostgreSQL Schema
-            db.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id SERIAL PRIMARY KEY,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    role TEXT DEFAULT 'user',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            db.execute('''
-                CREATE TABLE IF NOT EXISTS storage_new (
-                    user_id INTEGER NOT NULL,
-                    key TEXT NOT NULL,
-                    value TEXT,
-                    PRIMARY KEY (user_id, key),
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
+            db.execute('ANALYZE storage_new')
         else:
-             # SQLite Schema
-            db.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    role TEXT DEFAULT 'user',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            db.execute('''
-                CREATE TABLE IF NOT EXISTS storage_new (
-                    user_id INTEGER NOT NULL,
-                    key TEXT NOT NULL,
-                    value TEXT,
-                    PRIMARY KEY (user_id, key),
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
+            db.execute('PRAGMA optimize')
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Apply pending schema migrations (for deploys that set SCHEMA_BOOTSTRAP=0)"""
+    init_db()
+    print("Database schema is up to date")
+
+# --- Session Cache ---
+
+# Resolved users keyed by the user_id in the signed session cookie. Checking
+# the cookie against the users table revokes sessions of deleted users; the
+# cache keeps that to one lookup per user per minute.
+_session_cache = TTLCache(maxsize=10_000, ttl=60)
+_session_cache_lock = threading.Lock()
+
+def cache_user(user):
+    with _session_cache_lock:
+        _session_cache[user['id']] = user
+
+def resolve_user(user_id):
+    """Return {id, username, role} for a session's user, or None if it no longer exists"""
+    with _session_cache_lock:
+        user = _session_cache.get(user_id)
+    if user is None:
+        with get_db() as db:
+            row = db.execute(db.sql['get_user_by_id'], (user_id,), as_tuple=True).fetchone()
+        if row is None:
+            return None
+        user = {"id": row[0], "username": row[1], "role": row[2]}
+        cache_user(user)
+    return user
+
+# --- Storage Cache ---
+
+# Read-through cache of serialized storage values keyed by (user_id, key).
+# Entries are (JSON string as stored, ETag), so hits are served without DB
+# access or re-serialization. Writes evict and bump the key's generation; a
+# reader only fills the cache if no write landed since it read the DB, so an
+# older row can never overwrite a newer one. The TTL bounds staleness across
+# gunicorn workers, which each hold their own cache. It is bounded by
+# the total length of the stored strings; values past STORAGE_CACHE_MAX_ENTRY
+# are always read from the DB so a few large ones can't evict everything else.
+STORAGE_CACHE_MAX_ENTRY = 1 * 2**20
+_storage_cache = TTLCache(maxsize=64 * 2**20, ttl=60, getsizeof=lambda e: len(e[0]))
+_storage_generations = LRUCache(maxsize=20_000)
+_storage_write_seq = itertools.count(1)
+_storage_cache_lock = threading.Lock()
+
+def storage_etag(value):
+    return hashlib.blake2b(value.encode(), digest_size=12).hexdigest()
+
+def storage_generation(user_id, key):
+    """Snapshot to pass to fill_storage(); take it before reading the DB"""
+    with _storage_cache_lock:
+        return _storage_generations.get((user_id, key))
+
+def fill_storage(user_id, key, value, generation):
+    entry = (value, storage_etag(value))
+    if len(value) > STORAGE_CACHE_MAX_ENTRY:
+        return entry
+    with _storage_cache_lock:
+        if _storage_generations.get((user_id, key)) == generation:
+            _storage_cache[(user_id, key)] = entry
+    return entry
+
+def client_has_etag(etag):
+    """Whether If-None-Match names etag, including Flask-Compress' "<etag>:<encoding>" form"""
+    return any(tag == etag or tag.startswith(etag + ':') for tag in request.if_none_match.as_set())
+
+def evict_storage(user_id, key):
+    """Call after a write to key has committed"""
+    with _storage_cache_lock:
+        _storage_generations[(user_id, key)] = next(_storage_write_seq)
+        _storage_cache.pop((user_id, key), None)
+
+# --- Password Hashing ---
+
+# Werkzeug method for new hashes: 'scrypt[:n:r:p]' or 'pbkdf2[:hash[:iterations]]'
+# (e.g. 'pbkdf2:sha256:600000'). Other schemes such as argon2 are not
+# supported. Stored hashes carry their own method, so existing users keep
+# verifying.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+
+# Fail at startup rather than on every registration
+try:
+    generate_password_hash('', method=PASSWORD_HASH_METHOD)
+except ValueError as e:
+    raise SystemExit(f"Invalid PASSWORD_HASH_METHOD {PASSWORD_HASH_METHOD!r}: {e}")
+
+# Recently verified logins keyed by an HMAC of the credentials (never the
+# plaintext), so a repeated login skips the deliberately slow KDF.
+_login_cache = TTLCache(maxsize=10_000, ttl=30)
+_login_cache_lock = threading.Lock()
+
+def _usable_cpus():
+    # os.cpu_count() reports host CPUs; affinity reflects what we may run on
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# The KDFs are deliberately CPU-heavy. Capping how many run at once keeps a
+# burst of logins from taking every core from other requests. The default also
+# stays at or below half of gunicorn's threads (GUNICORN_THREADS, as in
+# gunicorn.conf.py), so auth can never occupy every request thread. Containers
+# limited by CPU quota rather than affinity should set KDF_CONCURRENCY.
+GUNICORN_THREADS = max(int(os.getenv('GUNICORN_THREADS', 8)), 1)
+KDF_CONCURRENCY = int(os.getenv('KDF_CONCURRENCY', 0)) or min(_usable_cpus(), max(GUNICORN_THREADS // 2, 1))
+_kdf_slots = threading.BoundedSemaphore(KDF_CONCURRENCY)
+
+# A request waiting for a slot still holds its thread, so give up after a short
+# wait and answer 503 instead of letting waiters pile up behind a burst.
+KDF_WAIT_SECONDS = float(os.getenv('KDF_WAIT_SECONDS', 2))
+
+class KDFBusy(Exception):
+    """Every KDF slot stayed taken for KDF_WAIT_SECONDS"""
+
+@contextmanager
+def _kdf_slot():
+    if not _kdf_slots.acquire(timeout=KDF_WAIT_SECONDS):
+        raise KDFBusy()
+    try:
+        yield
+    finally:
+        _kdf_slots.release()
+
+def hash_password(password):
+    with _kdf_slot():
+        return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+def verify_password(password_hash, password):
+    with _kdf_slot():
+        return check_password_hash(password_hash, password)
+
+def _login_key(username, password):
+    message = f"{username}\0{password}".encode()
+    return hmac.new(app.secret_key.encode(), message, hashlib.sha256).digest()
+
+# --- Canned Responses ---
+
+# Pre-serialized bodies for the most frequent fixed replies. A new Response is
+# still built per request, since session and CORS handling add headers to it.
+UNAUTHENTICATED_BODY = b'{"authenticated":false}'
+AUTH_REQUIRED_BODY = b'{"error":"Authentication required"}'
+SUCCESS_BODY = b'{"status":"success"}'
+
+def json_body_response(body, status=200):
+    return Response(body, status=status, mimetype='application/json')
+
+@app.errorhandler(KDFBusy)
+def kdf_busy(e):
+    response = jsonify({"error": "Server busy, please try again"})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
 
 # --- Auth Decorator ---
 
@@ -123,18 +453,32 @@ def login_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         if 'user_id' not in session:
-            return jsonify({"error": "Authentication required"}), 401
+            return json_body_response(AUTH_REQUIRED_BODY, 401)
+        user = resolve_user(session['user_id'])
+        if user is None:
+            session.clear()
+            return json_body_response(AUTH_REQUIRED_BODY, 401)
+        g.user = user
         return f(*args, **kwargs)
     return decorated
 
 # --- Static File Serving ---
 
+# index.html references assets with a version query (js/app.js?v=4.1) that is
+# bumped when they change, so those URLs can be cached for good. Everything
+# else is revalidated with its ETag and answered with a 304 when unchanged.
+STATIC_IMMUTABLE_MAX_AGE = 31536000
+
 @app.route('/')
 def serve_index():
     return send_from_directory('.', 'index.html')
 
 @app.route('/<path:path>')
 def serve_static(path):
+    if 'v' in request.args:
+        response = send_from_directory('.', path, max_age=STATIC_IMMUTABLE_MAX_AGE)
+        response.cache_control.immutable = True
+        return response
     return send_from_directory('.', path)
 
 # --- Authentication Endpoints ---
@@ -149,22 +493,26 @@ def register():
         return jsonify({"error": "Username and password required"}), 400
         
     try:
+        # Hash before checking out a connection so the KDF doesn't hold one
+        password_hash = hash_password(password)
         with get_db() as db:
-            db.execute(
-                'INSERT INTO users (username, password_hash) VALUES (?, ?)',
-                (username, generate_password_hash(password))
-            )
-            # Fetch the created user
-            user = db.execute('SELECT id, username, role FROM users WHERE username = ?', (username,)).fetchone()
-            # In Postgres RealDictCursor returns dict, SQLite returns Row (dict-like)
-            # Standardize to dict
-            user_dict = dict(user)
-            
-            # Set session
-            session['user_id'] = user_dict['id']
-            session['username'] = user_dict['username']
-            
-            return jsonify({"status": "success", "user": user_dict})
+            cursor = db.execute(db.sql['insert_user'], (username, password_hash), as_tuple=True)
+            # Build the created user without a second query: Postgres returns
+            # it from the insert, SQLite gives the new rowid
+            if db.is_postgres:
+                row = cursor.fetchone()
+                user_dict = {"id": row[0], "username": row[1], "role": row[2]}
+            else:
+                user_dict = {"id": cursor.lastrowid, "username": username, "role": 'user'}
+        
+        # Set session
+        session['user_id'] = user_dict['id']
+        session['username'] = user_dict['username']
+        cache_user(user_dict)
+        
+        return jsonify({"status": "success", "user": user_dict})
+    except KDFBusy:
+        raise
     except Exception as e:
         # Check for integrity error (duplicate username)
         if "UNIQUE constraint failed" in str(e) or "duplicate key value" in str(e):
@@ -178,90 +526,146 @@ def login():
     username = data.get('username')
     password = data.get('password')
     
-    with get_db() as db:
-        user = db.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        if user and check_password_hash(user['password_hash'], password):
-            # Set session
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            
-            return jsonify({
-                "status": "success",
-                "user": {
-                    "id": user['id'],
-                    "username": user['username'],
-                    "role": user['role']
-                }
-            })
-    return jsonify({"error": "Invalid username or password"}), 401
+    if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+        return jsonify({"error": "Invalid username or password"}), 401
+    
+    login_key = _login_key(username, password)
+    with _login_cache_lock:
+        user_dict = _login_cache.get(login_key)
+    
+    if user_dict is None:
+        with get_db() as db:
+            user = db.execute(db.sql['get_user'], (username, username)).fetchone()
+        if not user or not verify_password(user['password_hash'], password):
+            return jsonify({"error": "Invalid username or password"}), 401
+        user_dict = {
+            "id": user['id'],
+            "username": user['username'],
+            "role": user['role']
+        }
+        with _login_cache_lock:
+            _login_cache[login_key] = user_dict
+    
+    # Set session
+    session['user_id'] = user_dict['id']
+    session['username'] = user_dict['username']
+    cache_user(user_dict)
+    return jsonify({"status": "success", "user": user_dict})
 
 @app.route('/api/auth/session', methods=['GET'])
 def check_session():
     """Check if user has an active session"""
-    if 'user_id' in session:
-        return jsonify({
-            "authenticated": True,
-            "user": {
-                "id": session['user_id'],
-                "username": session['username']
-            }
-        })
-    return jsonify({"authenticated": False}), 401
+    if 'user_id' not in session:
+        return json_body_response(UNAUTHENTICATED_BODY, 401)
+    user = resolve_user(session['user_id'])
+    if user is None:
+        # Account is gone; drop the stale cookie
+        session.clear()
+        return json_body_response(UNAUTHENTICATED_BODY, 401)
+    return jsonify({"authenticated": True, "user": user})
 
 @app.route('/api/auth/logout', methods=['POST'])
 def logout():
+    with _session_cache_lock:
+        _session_cache.pop(session.get('user_id'), None)
     session.clear()
-    return jsonify({"status": "success"})
+    return json_body_response(SUCCESS_BODY)
 
 # --- Storage Endpoints (Session-Protected) ---
 
 @app.route('/api/storage/<key>', methods=['GET'])
 @login_required
 def get_data(key):
-    user_id = session['user_id']
+    user_id = g.user['id']
         
-    with get_db() as db:
-        row = db.execute('SELECT value FROM storage_new WHERE user_id = ? AND key = ?', (user_id, key)).fetchone()
-        if row:
-            return jsonify(json.loads(row['value']))
-        return jsonify(None)
+    with _storage_cache_lock:
+        entry = _storage_cache.get((user_id, key))
+    if entry is None:
+        generation = storage_generation(user_id, key)
+        with get_db() as db:
+            row = db.execute(db.sql['get_storage'], (user_id, key), as_tuple=True).fetchone()
+        if not row:
+            return jsonify(None)
+        entry = fill_storage(user_id, key, row[0], generation)
+    value, etag = entry
+    
+    if client_has_etag(etag):
+        response = Response(status=304)
+    else:
+        # The stored value is already JSON, send it as-is
+        response = Response(value, mimetype='application/json')
+    response.set_etag(etag)
+    # Per-user data: let the browser keep it, but revalidate every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/api/storage', methods=['POST'])
 @login_required
 def set_data():
     data = request.json
     key = data.get('key')
-    value = json.dumps(data.get('value'))
-    user_id = session['user_id']
+    value = orjson.dumps(data.get('value')).decode()
+    user_id = g.user['id']
         
     with get_db() as db:
-        if db.is_postgres:
-            # Postgres upsert
-            db.execute('''
-                INSERT INTO storage_new (user_id, key, value) 
-                VALUES (?, ?, ?) 
-                ON CONFLICT(user_id, key) DO UPDATE SET value = excluded.value
-            ''', (user_id, key, value))
-        else:
-            # SQLite upsert
-            db.execute('''
-                INSERT INTO storage_new (user_id, key, value) 
-                VALUES (?, ?, ?) 
-                ON CONFLICT(user_id, key) DO UPDATE SET value = excluded.value
-            ''', (user_id, key, value))
-    return jsonify({"status": "success"})
+        db.execute(db.sql['set_storage'], (user_id, key, value))
+    evict_storage(user_id, key)
+    return json_body_response(SUCCESS_BODY)
+
+@app.route('/api/storage/bulk', methods=['POST'])
+@login_required
+def set_data_bulk():
+    """Upsert several keys at once: {"items": [{"key": ..., "value": ...}, ...]}"""
+    data = request.json
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not all(
+        isinstance(item, dict) and isinstance(item.get('key'), str) and item['key']
+        for item in items
+    ):
+        return jsonify({"error": "items must be a list of objects with a non-empty string key"}), 400
+    user_id = g.user['id']
+    
+    # Last value wins for repeated keys; Postgres refuses to upsert a row twice
+    values = {item.get('key'): orjson.dumps(item.get('value')).decode() for item in items}
+    if values:
+        with get_db() as db:
+            db.execute_many(db.sql['set_storage_many'], [(user_id, key, value) for key, value in values.items()])
+        for key in values:
+            evict_storage(user_id, key)
+    return json_body_response(SUCCESS_BODY)
 
 @app.route('/api/storage/<key>', methods=['DELETE'])
 @login_required
 def remove_data(key):
-    user_id = session['user_id']
+    user_id = g.user['id']
         
     with get_db() as db:
-        db.execute('DELETE FROM storage_new WHERE user_id = ? AND key = ?', (user_id, key))
-    return jsonify({"status": "success"})
+        db.execute(db.sql['del_storage'], (user_id, key))
+    evict_storage(user_id, key)
+    return json_body_response(SUCCESS_BODY)
 
 # --- AI Chat Endpoint ---
 
+@lru_cache(maxsize=None)
+def _genai():
+    """Import and configure the Gemini SDK on first use; it is slow to import"""
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai
+
+@lru_cache(maxsize=16)
+def _get_model(system_context):
+    """Reuse GenerativeModel instances across requests with the same system prompt.
+
+    The system prompt is the client's static instructions; per-user data goes
+    in the request contents, so it is never held here.
+    """
+    return _genai().GenerativeModel(
+        model_name='gemini-flash-latest',
+        system_instruction=system_context
+    )
+
 @app.route('/api/chat', methods=['POST'])
 @login_required
 def chat():
@@ -270,31 +674,59 @@ def chat():
     
     data = request.json
     system_context = data.get('system_context', '')
+    user_context = data.get('context', '')
     user_message = data.get('message', '')
     
     try:
-        model = genai.GenerativeModel(
-            model_name='gemini-flash-latest',
-            system_instruction=system_context
+        model = _get_model(system_context)
+        response = model.generate_content(
+            [user_context, user_message] if user_context else user_message,
+            stream=True,
+            request_options={'timeout': GEMINI_TIMEOUT}
         )
-        response = model.generate_content(user_message)
-        return jsonify({"response": response.text})
     except Exception as e:
         print(f"Gemini API Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
+    
+    # Relay text to the client as Server-Sent Events while Gemini generates it
+    def generate():
+        try:
+            for chunk in response:
+                if chunk.parts:
+                    yield b'data: ' + orjson.dumps({"t": chunk.text}) + b'\n\n'
+        except Exception as e:
+            print(f"Gemini API Error: {str(e)}")
+            yield b'event: error\ndata: ' + orjson.dumps({"error": str(e)}) + b'\n\n'
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-# Initialize DB on startup (ensures tables exist when running with Gunicorn)
-try:
-    init_db()
-except Exception as e:
-    print(f"Database initialization error: {e}")
+# Initialize DB on startup (ensures tables exist when running with Gunicorn).
+# Deploys that migrate out-of-band with `flask --app server init-db` can set
+# SCHEMA_BOOTSTRAP=0 to skip this.
+if os.getenv('SCHEMA_BOOTSTRAP', '1') == '1':
+    try:
+        init_db()
+    except SchemaError:
+        # Needs an operator; refuse to start rather than retry it every boot
+        app.logger.exception("Database schema migration failed")
+        raise
+    except Exception:
+        app.logger.exception("Database initialization error")
+    finally:
+        # Don't carry connections into gunicorn's forked workers (preload_app)
+        close_pool()
 
 if __name__ == '__main__':
-    port = int(os.getenv('PORT', 8080))
-    debug = os.getenv('FLASK_ENV', 'development') == 'development'
+    # The Werkzeug server is for local development only; production runs
+    # `gunicorn server:app` (see gunicorn.conf.py)
+    if not os.getenv('USE_DEV_SERVER'):
+        raise SystemExit("Use `gunicorn server:app`, or set USE_DEV_SERVER=1 for local development")
     
-    # If using Render, debug is likely False. 
-    # If running locally with SQLite, we might want Debug=True
+    port = int(os.getenv('PORT', 8080))
+    debug = os.getenv('FLASK_ENV') == 'development'
     
     print(f"WealthFlow Expense Tracker running at http://localhost:{port}")
     app.run(host='0.0.0.0', port=port, debug=debug)